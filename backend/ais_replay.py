@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+🚢 AIS Track Replay - compare actual fuel burn against planned routes.
+
+Streams an AIS position log (CSV or Parquet) in chunks, splits each vessel's track
+into voyages, and compares the distance actually sailed with the direct route that
+`/route` would plan between the map-matched origin and destination ports.
+
+The log must be ordered by timestamp (or by MMSI, then timestamp), so every chunk
+holds a vessel's positions after those in earlier chunks.
+
+Usage:
+    python ais_replay.py positions.csv --output voyage_fuel.csv --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from apps import DB_PATH, calculate_distance, calculate_fuel
+from port_index import PortIndex, geodesic_km_arrays
+
+# Column names accepted for each field (matched case-insensitively)
+COLUMN_ALIASES = {
+    "mmsi": ("mmsi",),
+    "timestamp": ("basedatetime", "timestamp", "time", "datetime"),
+    "lat": ("lat", "latitude"),
+    "lon": ("lon", "lng", "longitude"),
+    "vessel_type": ("vesseltype", "vessel_type", "ship_type", "shiptype"),
+}
+
+VOYAGE_GAP_HOURS = 6.0  # A longer silence starts a new voyage
+STOP_SPEED_KNOTS = 0.5  # Slower than this between fixes counts as moored/anchored
+MAX_SPEED_KNOTS = 60.0  # Faster than this between fixes is a position glitch
+MIN_VOYAGE_KM = 5.0  # Shorter pieces are harbour movements, not voyages
+PORT_MATCH_KM = 50.0  # Voyage ends further than this from any port stay unmatched
+KM_PER_NAUTICAL_MILE = 1.852
+
+
+# 🔹 Function to map AIS vessel type codes onto the project's ship types
+def ship_type_from_ais(code, default="standard"):
+    if code is None or np.isnan(code):
+        return default
+    code = int(code)
+    if 60 <= code <= 69:
+        return "passenger"
+    if 70 <= code <= 79:
+        return "cargo"
+    if 80 <= code <= 89:
+        return "tanker"
+    return default
+
+
+# 🔹 Function to resolve the log's column names
+def resolve_columns(columns):
+    lookup = {c.lower(): c for c in columns}
+    resolved = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        match = next((lookup[a] for a in aliases if a in lookup), None)
+        if match is None and field != "vessel_type":
+            raise ValueError(f"AIS log has no {field} column (expected one of: {', '.join(aliases)})")
+        resolved[field] = match
+    return resolved
+
+
+# 🔹 Function to stream an AIS log as DataFrame chunks with canonical column names
+def read_chunks(path, chunk_size):
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet requires pyarrow: pip install pyarrow")
+
+        parquet = pq.ParquetFile(path)
+        columns = resolve_columns(parquet.schema_arrow.names)
+        wanted = {v: k for k, v in columns.items() if v is not None}
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(wanted)):
+            yield batch.to_pandas().rename(columns=wanted)
+    else:
+        columns = resolve_columns(pd.read_csv(path, nrows=0).columns)
+        wanted = {v: k for k, v in columns.items() if v is not None}
+        for chunk in pd.read_csv(path, usecols=list(wanted), chunksize=chunk_size):
+            yield chunk.rename(columns=wanted)
+
+
+# 🔹 Function to convert a chunk into plain arrays for the worker processes
+def chunk_arrays(chunk):
+    # Text timestamps are parsed by the workers so the reader never waits on them
+    timestamps = chunk["timestamp"]
+    return (
+        chunk["mmsi"].to_numpy(np.int64),
+        timestamps.to_numpy(np.int64) if pd.api.types.is_numeric_dtype(timestamps) else timestamps.to_numpy(object),
+        chunk["lat"].to_numpy(np.float64),
+        chunk["lon"].to_numpy(np.float64),
+        chunk["vessel_type"].to_numpy(np.float64) if "vessel_type" in chunk else None,
+    )
+
+
+# 🔹 Worker: split one chunk into voyage pieces
+def summarize_chunk(arrays):
+    """
+    Break each vessel's positions into pieces at time gaps and stops.
+    Pieces touching the chunk edges are kept open so the parent can stitch them
+    to the neighbouring chunks; closed pieces shorter than MIN_VOYAGE_KM are dropped.
+    """
+    mmsi, ts, lat, lon, vessel_type = arrays
+    n = len(mmsi)
+    if n == 0:
+        return None
+
+    if ts.dtype == object:
+        ts = pd.to_datetime(ts, utc=True).as_unit("s").asi8
+
+    order = np.lexsort((ts, mmsi))
+    mmsi, ts, lat, lon = mmsi[order], ts[order], lat[order], lon[order]
+    if vessel_type is not None:
+        vessel_type = vessel_type[order]
+
+    step_km = geodesic_km_arrays(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    step_hours = (ts[1:] - ts[:-1]) / 3600.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        knots = np.where(step_hours > 0, step_km / step_hours / KM_PER_NAUTICAL_MILE, np.where(step_km > 0, np.inf, 0.0))
+
+    same_vessel = mmsi[1:] == mmsi[:-1]
+    moving = knots >= STOP_SPEED_KNOTS
+    breaks = ~same_vessel | (step_hours > VOYAGE_GAP_HOURS) | ((step_hours > 0) & ~moving)
+    step_km = np.where(breaks | (knots > MAX_SPEED_KNOTS), 0.0, step_km)
+
+    starts = np.concatenate(([0], np.nonzero(breaks)[0] + 1))
+    ends = np.concatenate((starts[1:] - 1, [n - 1]))
+    distance = np.add.reduceat(np.append(step_km, 0.0), starts)
+
+    vessel_first = np.concatenate(([True], ~same_vessel))
+    vessel_last = np.concatenate((~same_vessel, [True]))
+    open_start = vessel_first[starts]
+    open_end = vessel_last[ends]
+
+    keep = open_start | open_end | (distance >= MIN_VOYAGE_KM)
+    starts, ends = starts[keep], ends[keep]
+    return {
+        "mmsi": mmsi[starts],
+        "start_ts": ts[starts],
+        "start_lat": lat[starts],
+        "start_lon": lon[starts],
+        "end_ts": ts[ends],
+        "end_lat": lat[ends],
+        "end_lon": lon[ends],
+        "distance_km": distance[keep],
+        "points": ends - starts + 1,
+        "open_start": open_start[keep],
+        "open_end": open_end[keep],
+        "vessel_type": vessel_type[starts] if vessel_type is not None else np.full(len(starts), np.nan),
+    }
+
+
+# 🔹 Function to stitch voyage pieces across chunk boundaries
+def stitch_voyages(summaries):
+    """
+    Join each chunk's open-start pieces onto the same vessel's open piece from an
+    earlier chunk when the link between them is neither a gap nor a stop.
+    Yields finished voyages as dicts.
+    """
+    open_pieces = {}
+
+    for summary in summaries:
+        if summary is None:
+            continue
+        rows = zip(*(summary[k].tolist() for k in (
+            "mmsi", "start_ts", "start_lat", "start_lon", "end_ts", "end_lat", "end_lon",
+            "distance_km", "points", "open_start", "open_end", "vessel_type",
+        )))
+        for mmsi, s_ts, s_lat, s_lon, e_ts, e_lat, e_lon, dist, points, o_start, o_end, vtype in rows:
+            piece = {
+                "mmsi": mmsi, "start_ts": s_ts, "start_lat": s_lat, "start_lon": s_lon,
+                "end_ts": e_ts, "end_lat": e_lat, "end_lon": e_lon,
+                "distance_km": dist, "points": points, "vessel_type": vtype,
+            }
+
+            previous = open_pieces.pop(mmsi, None) if o_start else None
+            if previous is not None:
+                link_hours = (s_ts - previous["end_ts"]) / 3600.0
+                link_km = float(geodesic_km_arrays(previous["end_lat"], previous["end_lon"], s_lat, s_lon))
+                link_knots = link_km / link_hours / KM_PER_NAUTICAL_MILE if link_hours > 0 else np.inf
+                if 0 <= link_hours <= VOYAGE_GAP_HOURS and link_knots >= STOP_SPEED_KNOTS:
+                    previous.update(end_ts=e_ts, end_lat=e_lat, end_lon=e_lon)
+                    previous["distance_km"] += dist + (link_km if link_knots <= MAX_SPEED_KNOTS else 0.0)
+                    previous["points"] += points
+                    piece = previous
+                else:
+                    yield previous
+
+            if o_end:
+                open_pieces[mmsi] = piece
+            else:
+                yield piece
+
+    yield from open_pieces.values()
+
+
+# 🔹 Function to compare one voyage with the planned direct route
+def voyage_fuel_delta(voyage, port_index, default_ship_type):
+    origin = port_index.nearest(voyage["start_lat"], voyage["start_lon"], max_km=PORT_MATCH_KM)
+    destination = port_index.nearest(voyage["end_lat"], voyage["end_lon"], max_km=PORT_MATCH_KM)
+    if origin is None or destination is None:
+        return None
+
+    ship_type = ship_type_from_ais(voyage["vessel_type"], default_ship_type)
+    actual_km = voyage["distance_km"]
+    planned_km = calculate_distance(origin[0]["coordinates"], destination[0]["coordinates"])
+    hours = (voyage["end_ts"] - voyage["start_ts"]) / 3600.0
+    actual_fuel = calculate_fuel(actual_km, ship_type)
+    planned_fuel = calculate_fuel(planned_km, ship_type)
+
+    return {
+        "mmsi": voyage["mmsi"],
+        "departure": pd.Timestamp(voyage["start_ts"], unit="s", tz="UTC").isoformat(),
+        "arrival": pd.Timestamp(voyage["end_ts"], unit="s", tz="UTC").isoformat(),
+        "origin_port": origin[0]["name"],
+        "destination_port": destination[0]["name"],
+        "ship_type": ship_type,
+        "positions": voyage["points"],
+        "actual_distance_km": round(actual_km, 2),
+        "planned_distance_km": round(planned_km, 2),
+        "avg_speed_knots": round(actual_km / hours / KM_PER_NAUTICAL_MILE, 2) if hours > 0 else None,
+        "actual_fuel_tons": actual_fuel,
+        "planned_fuel_tons": planned_fuel,
+        "fuel_delta_tons": round(actual_fuel - planned_fuel, 2),
+    }
+
+
+# 🔹 Function to run chunks through the pool in order, holding only a few in memory
+def ordered_map(pool, func, items, max_pending):
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# 🔹 Function to replay a whole AIS log
+def replay(path, workers=None, chunk_size=1_000_000, ship_type="standard"):
+    port_index = PortIndex.from_database(DB_PATH)
+    positions = 0
+    voyages = []
+    unmatched = 0
+
+    def counted_chunks():
+        nonlocal positions
+        for chunk in read_chunks(path, chunk_size):
+            positions += len(chunk)
+            yield chunk_arrays(chunk)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Results come back in chunk order, which stitching relies on
+        summaries = ordered_map(pool, summarize_chunk, counted_chunks(), max_pending=workers * 2)
+        for voyage in stitch_voyages(summaries):
+            if voyage["distance_km"] < MIN_VOYAGE_KM:
+                continue
+            result = voyage_fuel_delta(voyage, port_index, ship_type)
+            if result is None:
+                unmatched += 1
+            else:
+                voyages.append(result)
+
+    return pd.DataFrame(voyages), positions, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay AIS tracks and compare fuel burn with planned routes.")
+    parser.add_argument("log", help="AIS position log (.csv or .parquet)")
+    parser.add_argument("--output", default="voyage_fuel.csv", help="CSV file for per-voyage fuel deltas")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Positions per chunk")
+    parser.add_argument("--ship-type", default="standard", help="Ship type for vessels without an AIS type code")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"❌ AIS log not found: {args.log}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    voyages, positions, unmatched = replay(args.log, args.workers, args.chunk_size, args.ship_type)
+    elapsed = time.perf_counter() - started
+
+    voyages.to_csv(args.output, index=False)
+    print(f"✅ Replayed {positions:,} positions in {elapsed:.1f}s ({positions / max(elapsed, 1e-9) * 60:,.0f} per minute)")
+    print(f"✅ Wrote {len(voyages)} voyages to {args.output} ({unmatched} voyages without a port match skipped)")
+    if len(voyages):
+        print(f"ℹ️ Total fuel delta vs planned routes: {voyages['fuel_delta_tons'].sum():,.2f} tons")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,35 @@
 import os
 import sqlite3
-from fastapi import FastAPI, HTTPException, Query
+import threading
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 import geopy.distance
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import itertools
+from route_cache import CoalescingCache
+from tours import TourStore
+from profiling import ProfilingMiddleware, SamplingProfiler
+from port_index import PortIndex
+from geometry import GEOMETRY_ENCODINGS, route_longitude_offsets, segment_geometry
+from eca import eca_fractions
+from response_formats import Table, negotiate, negotiated_response
 
 app = FastAPI()
 
+# 🔹 Opt-in sampling profiler (armed per request, via admin endpoint, or by a slow-request threshold)
+# Per-request capture and the /debug/profiles endpoints need the PROFILE_TOKEN secret
+profiler = SamplingProfiler(
+    interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", "5")),
+    slow_threshold_ms=float(os.environ.get("PROFILE_SLOW_MS", "0")),
+    max_profiles=50,
+    token=os.environ.get("PROFILE_TOKEN"),
+)
+app.router.route_class = profiler.route_class()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
 # Enable CORS for frontend integration
 app.add_middleware(
     CORSMiddleware,
@@ -17,9 +39,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 🔹 Compress responses for clients that accept gzip, skipping small bodies where it doesn't pay off
+GZIP_MINIMUM_SIZE = int(os.environ.get("GZIP_MINIMUM_SIZE", "1024"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=6)
+
 # ✅ Use the absolute path to `ports.db`
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ports.db")
 
+# 🔹 Coalesce identical concurrent route requests & keep results briefly for bursty refreshes
+ROUTE_CACHE_TTL_SECONDS = float(os.environ.get("ROUTE_CACHE_TTL_SECONDS", "5"))
+route_cache = CoalescingCache(ttl=ROUTE_CACHE_TTL_SECONDS, max_entries=256)
+
+# 🔹 Accepted values for the optional route geometry parameter
+GEOMETRY_PATTERN = "^(" + "|".join(GEOMETRY_ENCODINGS) + ")$"
+
+# 🔹 Editable tours kept in memory between requests
+tour_store = TourStore(max_tours=1000)
+
+# 🔹 Column names of tabular port responses
+PORT_COLUMNS = ("name", "country", "latitude", "longitude")
+REACHABLE_COLUMNS = PORT_COLUMNS + ("distance_km", "fuel_tons", "stops", "via")
+
+# 🔹 Spatial index over all ports, loaded lazily
+_port_index = None
+_port_index_lock = threading.Lock()
+
 
 # 🔹 Function to check if database exists
 def check_database():
@@ -47,18 +91,41 @@ def calculate_distance(coord1, coord2):
     return geopy.distance.geodesic(coord1, coord2).km
 
 
+# 🔹 Fuel efficiency per ship type (tons of fuel per km)
+FUEL_EFFICIENCY_MAP = {
+    "standard": 0.05,  # 0.05 tons of fuel per km
+    "cargo": 0.07,
+    "tanker": 0.09,
+    "passenger": 0.04,
+}
+
+# 🔹 Extra cost of low-sulphur fuel burned inside emission control areas (USD per ton)
+LOW_SULPHUR_PREMIUM_USD_PER_TON = float(os.environ.get("LOW_SULPHUR_PREMIUM_USD_PER_TON", "250"))
+
+
 # 🔹 Function to calculate fuel consumption
 def calculate_fuel(distance, ship_type="standard"):
-    fuel_efficiency_map = {
-        "standard": 0.05,  # 0.05 tons of fuel per km
-        "cargo": 0.07,
-        "tanker": 0.09,
-        "passenger": 0.04,
-    }
-    fuel_efficiency = fuel_efficiency_map.get(ship_type.lower(), 0.05)
+    fuel_efficiency = FUEL_EFFICIENCY_MAP.get(ship_type.lower(), 0.05)
     return round(distance * fuel_efficiency, 2)
 
 
+# 🔹 Function to convert a fuel budget into a sailing range (km)
+def calculate_range(fuel_tons, ship_type="standard"):
+    fuel_efficiency = FUEL_EFFICIENCY_MAP.get(ship_type.lower(), 0.05)
+    return fuel_tons / fuel_efficiency
+
+
+# 🔹 Function to get the spatial port index (built once on first use)
+def get_port_index():
+    global _port_index
+    if _port_index is None:
+        check_database()
+        with _port_index_lock:
+            if _port_index is None:
+                _port_index = PortIndex.from_database(DB_PATH)
+    return _port_index
+
+
 # 🔹 API to check if the server is running
 @app.get("/")
 def home():
@@ -67,12 +134,14 @@ def home():
 
 # 🔹 API to fetch ports with pagination
 @app.get("/ports/")
-def get_ports(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
+def get_ports(request: Request, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
     """
     Fetch ports with pagination.
     - `limit`: Number of ports to return (1-100)
     - `offset`: Number of ports to skip
+    Honors `Accept` for JSON, MessagePack and the columnar layout.
     """
+    response_format = negotiate(request)
     check_database()  # Ensure database exists
 
     try:
@@ -85,9 +154,9 @@ def get_ports(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)
         conn.close()
 
         if not ports:
-            return {"message": "No ports found in the database!"}
+            return negotiated_response(response_format, {"message": "No ports found in the database!"})
 
-        return {"ports": [{"name": p[0], "country": p[1], "latitude": p[2], "longitude": p[3]} for p in ports]}
+        return negotiated_response(response_format, {"ports": Table(PORT_COLUMNS, ports)})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
@@ -95,12 +164,14 @@ def get_ports(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)
 
 # 🔹 API to fetch ports by state/country
 @app.get("/ports/by-state/{state}")
-def get_ports_by_state(state: str, limit: int = Query(50, ge=1, le=200)):
+def get_ports_by_state(request: Request, state: str, limit: int = Query(50, ge=1, le=200)):
     """
     Fetch ports filtered by state/country.
     - `state`: State or country name to filter by
     - `limit`: Maximum number of ports to return
+    Honors `Accept` for JSON, MessagePack and the columnar layout.
     """
+    response_format = negotiate(request)
     check_database()
 
     try:
@@ -114,18 +185,83 @@ def get_ports_by_state(state: str, limit: int = Query(50, ge=1, le=200)):
         conn.close()
 
         if not ports:
-            return {"message": f"No ports found for state/country: {state}"}
+            return negotiated_response(response_format, {"message": f"No ports found for state/country: {state}"})
 
-        return {
+        return negotiated_response(response_format, {
             "state": state,
             "port_count": len(ports),
-            "ports": [{"name": p[0], "country": p[1], "latitude": p[2], "longitude": p[3]} for p in ports]
-        }
+            "ports": Table(PORT_COLUMNS, ports)
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
 
+# 🔹 Cap on (stops + 1) × range for multi-hop reachability; past it, each refuel layer is
+# close to an all-pairs distance matrix (hundreds of ms) while adding few ports
+MULTI_HOP_REACH_KM = 8000
+MAX_FUEL_TONS = 1_000_000  # Far above any ship's bunker capacity
+
+
+# 🔹 API to find ports reachable within a fuel budget
+@app.get("/ports/reachable")
+def get_reachable_ports(
+    request: Request,
+    from_port: str = Query(..., alias="from"),
+    fuel_tons: float = Query(..., gt=0, le=MAX_FUEL_TONS, allow_inf_nan=False),
+    ship_type: str = "standard",
+    max_stops: int = Query(0, ge=0, le=3),
+    limit: int = Query(100, ge=1, le=10000),
+):
+    """
+    List ports a ship can reach with the fuel on board, cheapest first.
+    - `from`: Starting port name
+    - `fuel_tons`: Fuel on board (finite, up to `MAX_FUEL_TONS`); converted to a range with the ship type's efficiency
+    - `ship_type`: Ship type for fuel efficiency
+    - `max_stops`: Refuel stops allowed on the way (0 = direct only); each leg must fit the full budget.
+      Lowered so (stops + 1) × range stays within `MULTI_HOP_REACH_KM`; the stops used are returned.
+    - `limit`: Maximum number of ports to return
+    Honors `Accept` for JSON, MessagePack and the columnar layout.
+    """
+    response_format = negotiate(request)
+    start_details = get_port_details(from_port)
+    if not start_details:
+        raise HTTPException(status_code=400, detail=f"Start port '{from_port}' not found in database.")
+
+    index = get_port_index()
+    range_km = calculate_range(fuel_tons, ship_type)
+    # Fewest-stops-first search down from max_stops; compares products so tiny ranges can't overflow
+    stops_allowed = next(s for s in range(max_stops, -1, -1) if s == 0 or (s + 1) * range_km <= MULTI_HOP_REACH_KM)
+    origin = index.lookup(start_details[0])
+    reachable = index.reachable(
+        start_details[1], start_details[2], range_km, stops_allowed, exclude=origin["index"] if origin else None
+    )
+    reachable.sort(key=lambda item: (item[1], item[0]["name"]))
+
+    return negotiated_response(response_format, {
+        "from": start_details[0],
+        "ship_type": ship_type,
+        "fuel_tons": fuel_tons,
+        "range_km": round(range_km, 2),
+        "max_stops": stops_allowed,
+        "max_stops_requested": max_stops,
+        "reachable_count": len(reachable),
+        "ports": Table(REACHABLE_COLUMNS, [
+            (
+                port["name"],
+                port["country"],
+                port["coordinates"][0],
+                port["coordinates"][1],
+                round(distance, 2),
+                calculate_fuel(distance, ship_type),
+                len(via),
+                [index.ports[k]["name"] for k in via],
+            )
+            for port, distance, via in reachable[:limit]
+        ])
+    })
+
+
 # 🔹 API to get all available states/countries
 @app.get("/states/")
 def get_states():
@@ -152,13 +288,24 @@ def get_states():
 
 # 🔹 API for route optimization & fuel calculation
 @app.get("/route")
-def get_route(start: str, destination: str, ship_type: str = "standard"):
+def get_route(
+    request: Request,
+    start: str,
+    destination: str,
+    ship_type: str = "standard",
+    geometry: Optional[str] = Query(None, pattern=GEOMETRY_PATTERN),
+    zoom: int = Query(8, ge=0, le=20),
+):
     """
     Get optimized route & fuel estimation.
     - `start`: Starting port name
     - `destination`: Destination port name
     - `ship_type`: Ship type for fuel efficiency (default: standard)
+    - `geometry`: Optional path geometry, `polyline` (Google encoded) or `float32` (base64 lat/lon pairs)
+    - `zoom`: Map zoom level the geometry is simplified for
+    Honors `Accept` for JSON and MessagePack.
     """
+    response_format = negotiate(request)
     check_database()  # Ensure database exists
 
     start_details = get_port_details(start)
@@ -177,24 +324,106 @@ def get_route(start: str, destination: str, ship_type: str = "standard"):
     distance = calculate_distance(start_coords, destination_coords)
     fuel_required = calculate_fuel(distance, ship_type)
 
-    return {
+    result = {
         "start_port": start_details[0],
         "destination_port": destination_details[0],
         "distance_km": round(distance, 2),
         "fuel_required_tons": fuel_required,
         "ship_type": ship_type,
     }
+    if geometry:
+        result["geometry"], result["geometry_points"] = segment_geometry(start_coords, destination_coords, zoom, geometry)
+        result["geometry_encoding"] = geometry
+    return negotiated_response(response_format, result)
+
+
+# 🔹 Function to build per-segment distance & fuel for an ordered route
+def build_route_segments(route, ship_type="standard", geometry=None, zoom=8):
+    total_distance = 0
+    route_segments = []
+    if geometry:
+        # Consecutive segments join up even when the route crosses the antimeridian
+        lon_offsets = route_longitude_offsets([port["coordinates"] for port in route])
+
+    for i in range(len(route) - 1):
+        current = route[i]
+        next_port = route[i + 1]
+
+        segment_distance = calculate_distance(current["coordinates"], next_port["coordinates"])
+        segment_fuel = calculate_fuel(segment_distance, ship_type)
+
+        total_distance += segment_distance
+        segment = {
+            "from": current["name"],
+            "to": next_port["name"],
+            "distance_km": round(segment_distance, 2),
+            "fuel_tons": segment_fuel
+        }
+        segment.update(split_eca(current["coordinates"], next_port["coordinates"], segment_distance, ship_type))
+        if geometry:
+            segment["geometry"], segment["geometry_points"] = segment_geometry(
+                current["coordinates"], next_port["coordinates"], zoom, geometry, lon_offsets[i]
+            )
+        route_segments.append(segment)
+
+    return total_distance, route_segments
+
+
+# 🔹 Function to split one segment into inside-ECA and outside-ECA distance & fuel
+def split_eca(start, end, distance, ship_type="standard"):
+    fractions = eca_fractions(start, end)
+    eca_distance = distance * sum(fraction for _, fraction in fractions)
+    return {
+        "eca_distance_km": round(eca_distance, 2),
+        "eca_fuel_tons": calculate_fuel(eca_distance, ship_type),
+        "non_eca_distance_km": round(distance - eca_distance, 2),
+        "non_eca_fuel_tons": calculate_fuel(distance - eca_distance, ship_type),
+        "eca_zones": [name for name, _ in fractions],
+    }
+
+
+# 🔹 Function to total the ECA share of a route and the low-sulphur fuel premium
+def eca_totals(route_segments):
+    eca_distance = sum(segment["eca_distance_km"] for segment in route_segments)
+    eca_fuel = sum(segment["eca_fuel_tons"] for segment in route_segments)
+    return {
+        "total_eca_distance_km": round(eca_distance, 2),
+        "total_eca_fuel_tons": round(eca_fuel, 2),
+        "eca_fuel_premium_usd": round(eca_fuel * LOW_SULPHUR_PREMIUM_USD_PER_TON, 2),
+    }
+
+
+# 🔹 Function to resolve port names into route stops
+def resolve_ports(port_list):
+    stops = []
+    for port_name in port_list:
+        details = get_port_details(port_name)
+        if not details:
+            raise HTTPException(status_code=400, detail=f"Port '{port_name}' not found in database.")
+        stops.append({"name": details[0], "coordinates": (details[1], details[2])})
+    return stops
 
 
 # 🔹 API for multi-port route optimization
 @app.get("/route/multi")
-def get_multi_route(ports: str, ship_type: str = "standard", optimize: bool = True):
+def get_multi_route(
+    request: Request,
+    ports: str,
+    ship_type: str = "standard",
+    optimize: bool = True,
+    geometry: Optional[str] = Query(None, pattern=GEOMETRY_PATTERN),
+    zoom: int = Query(8, ge=0, le=20),
+):
     """
     Get optimized route for multiple ports.
     - `ports`: Comma-separated list of port names
     - `ship_type`: Ship type for fuel efficiency
     - `optimize`: Whether to optimize the route order (True) or use given order (False)
+    - `geometry`: Optional per-segment geometry, `polyline` or `float32`
+    - `zoom`: Map zoom level the geometry is simplified for
+    Honors `Accept` for JSON and MessagePack.
     """
+    response_format = negotiate(request)
     check_database()
 
     port_list = [p.strip() for p in ports.split(",") if p.strip()]
@@ -202,16 +431,20 @@ def get_multi_route(ports: str, ship_type: str = "standard", optimize: bool = Tr
     if len(port_list) < 2:
         raise HTTPException(status_code=400, detail="At least 2 ports are required.")
 
+    # Port lookups are case-insensitive and an optimized tour only depends on the
+    # starting port, so duplicates with the same port set share one computation
+    if optimize and len(port_list) > 2:
+        port_list = [port_list[0]] + sorted(port_list[1:], key=str.lower)
+    key = ("multi", tuple(p.lower() for p in port_list), ship_type, optimize, geometry, zoom if geometry else None)
+
+    result = route_cache.get_or_compute(key, lambda: compute_multi_route(port_list, ship_type, optimize, geometry, zoom))
+    return negotiated_response(response_format, result)
+
+
+# 🔹 Function to compute a multi-port route (shared by coalesced requests)
+def compute_multi_route(port_list, ship_type, optimize, geometry=None, zoom=8):
     # Get port details for all ports
-    port_details = []
-    for port_name in port_list:
-        details = get_port_details(port_name)
-        if not details:
-            raise HTTPException(status_code=400, detail=f"Port '{port_name}' not found in database.")
-        port_details.append({
-            "name": details[0],
-            "coordinates": (details[1], details[2])
-        })
+    port_details = resolve_ports(port_list)
 
     if optimize and len(port_details) > 2:
         # Use nearest neighbor algorithm for route optimization
@@ -220,45 +453,43 @@ def get_multi_route(ports: str, ship_type: str = "standard", optimize: bool = Tr
         optimized_route = port_details
 
     # Calculate total distance and fuel
-    total_distance = 0
-    route_segments = []
-    
-    for i in range(len(optimized_route) - 1):
-        current = optimized_route[i]
-        next_port = optimized_route[i + 1]
-        
-        segment_distance = calculate_distance(current["coordinates"], next_port["coordinates"])
-        segment_fuel = calculate_fuel(segment_distance, ship_type)
-        
-        total_distance += segment_distance
-        route_segments.append({
-            "from": current["name"],
-            "to": next_port["name"],
-            "distance_km": round(segment_distance, 2),
-            "fuel_tons": segment_fuel
-        })
-
+    total_distance, route_segments = build_route_segments(optimized_route, ship_type, geometry, zoom)
     total_fuel = calculate_fuel(total_distance, ship_type)
 
-    return {
+    result = {
         "route": [port["name"] for port in optimized_route],
         "total_distance_km": round(total_distance, 2),
         "total_fuel_tons": total_fuel,
         "ship_type": ship_type,
         "segments": route_segments,
-        "optimized": optimize
+        "optimized": optimize,
+        **eca_totals(route_segments),
     }
+    if geometry:
+        result["geometry_encoding"] = geometry
+    return result
 
 
 # 🔹 API for state-based route planning
 @app.get("/route/states")
-def get_state_routes(states: str, ship_type: str = "standard", ports_per_state: int = Query(3, ge=1, le=10)):
+def get_state_routes(
+    request: Request,
+    states: str,
+    ship_type: str = "standard",
+    ports_per_state: int = Query(3, ge=1, le=10),
+    geometry: Optional[str] = Query(None, pattern=GEOMETRY_PATTERN),
+    zoom: int = Query(8, ge=0, le=20),
+):
     """
     Plan routes across multiple states, visiting ports in each state.
     - `states`: Comma-separated list of states/countries
     - `ship_type`: Ship type for fuel efficiency
     - `ports_per_state`: Number of ports to visit per state
+    - `geometry`: Optional per-segment geometry, `polyline` or `float32`
+    - `zoom`: Map zoom level the geometry is simplified for
+    Honors `Accept` for JSON and MessagePack.
     """
+    response_format = negotiate(request)
     check_database()
 
     state_list = [s.strip() for s in states.split(",") if s.strip()]
@@ -266,6 +497,17 @@ def get_state_routes(states: str, ship_type: str = "standard", ports_per_state:
     if len(state_list) < 2:
         raise HTTPException(status_code=400, detail="At least 2 states are required.")
 
+    # State order decides the starting port and is echoed back, so it stays in the key
+    key = ("states", tuple(state_list), ship_type, ports_per_state, geometry, zoom if geometry else None)
+
+    result = route_cache.get_or_compute(
+        key, lambda: compute_state_routes(state_list, ship_type, ports_per_state, geometry, zoom)
+    )
+    return negotiated_response(response_format, result)
+
+
+# 🔹 Function to compute a state-based route (shared by coalesced requests)
+def compute_state_routes(state_list, ship_type, ports_per_state, geometry=None, zoom=8):
     # Get ports for each state
     state_ports = {}
     for state in state_list:
@@ -299,35 +541,220 @@ def get_state_routes(states: str, ship_type: str = "standard", ports_per_state:
     optimized_route = optimize_route(route)
 
     # Calculate total distance and fuel
-    total_distance = 0
-    route_segments = []
-    
-    for i in range(len(optimized_route) - 1):
-        current = optimized_route[i]
-        next_port = optimized_route[i + 1]
-        
-        segment_distance = calculate_distance(current["coordinates"], next_port["coordinates"])
-        segment_fuel = calculate_fuel(segment_distance, ship_type)
-        
-        total_distance += segment_distance
-        route_segments.append({
-            "from": current["name"],
-            "to": next_port["name"],
-            "distance_km": round(segment_distance, 2),
-            "fuel_tons": segment_fuel
-        })
-
+    total_distance, route_segments = build_route_segments(optimized_route, ship_type, geometry, zoom)
     total_fuel = calculate_fuel(total_distance, ship_type)
 
-    return {
+    result = {
         "states": state_list,
         "route": [port["name"] for port in optimized_route],
         "total_distance_km": round(total_distance, 2),
         "total_fuel_tons": total_fuel,
         "ship_type": ship_type,
         "segments": route_segments,
-        "ports_per_state": ports_per_state
+        "ports_per_state": ports_per_state,
+        **eca_totals(route_segments),
     }
+    if geometry:
+        result["geometry_encoding"] = geometry
+    return result
+
+
+# 🔹 Request bodies for editable tours
+class TourCreate(BaseModel):
+    ports: List[str]
+    ship_type: str = "standard"
+    optimize: bool = True
+
+
+class TourEdit(BaseModel):
+    insert: List[str] = []
+    remove: List[str] = []
+
+
+# 🔹 Function to describe one leg of a tour
+def tour_segment(tour, index):
+    distance = tour.legs[index]
+    return {
+        "index": index,
+        "from": tour.ports[index]["name"],
+        "to": tour.ports[index + 1]["name"],
+        "distance_km": round(distance, 2),
+        "fuel_tons": calculate_fuel(distance, tour.ship_type)
+    }
+
+
+# 🔹 Function to summarize a tour's route & totals
+def tour_summary(tour):
+    total_distance = tour.total_distance()
+    return {
+        "tour_id": tour.id,
+        "route": [port["name"] for port in tour.ports],
+        "total_distance_km": round(total_distance, 2),
+        "total_fuel_tons": calculate_fuel(total_distance, tour.ship_type),
+        "ship_type": tour.ship_type
+    }
+
+
+# 🔹 Function to fetch a tour or fail with 404
+def get_tour_or_404(tour_id):
+    tour = tour_store.get(tour_id)
+    if tour is None:
+        raise HTTPException(status_code=404, detail=f"Tour '{tour_id}' not found.")
+    return tour
+
+
+# 🔹 API to create an editable tour
+@app.post("/tours")
+def create_tour(body: TourCreate):
+    """
+    Create a tour that can later be edited port by port.
+    - `ports`: Port names; the first one is the fixed starting port
+    - `ship_type`: Ship type for fuel efficiency
+    - `optimize`: Whether to optimize the initial order (True) or use given order (False)
+    """
+    check_database()
+
+    port_list = [p.strip() for p in body.ports if p.strip()]
+
+    if len(port_list) < 2:
+        raise HTTPException(status_code=400, detail="At least 2 ports are required.")
+
+    stops = resolve_ports(port_list)
+    if body.optimize and len(stops) > 2:
+        stops = optimize_route(stops)
+
+    tour = tour_store.create(stops, body.ship_type, calculate_distance)
+    return {**tour_summary(tour), "segments": [tour_segment(tour, k) for k in range(len(tour.legs))]}
+
+
+# 🔹 API to fetch a tour with all of its segments
+@app.get("/tours/{tour_id}")
+def get_tour(tour_id: str):
+    tour = get_tour_or_404(tour_id)
+    with tour.lock:
+        return {**tour_summary(tour), "segments": [tour_segment(tour, k) for k in range(len(tour.legs))]}
+
+
+# 🔹 API to insert or remove ports without re-solving the whole tour
+@app.patch("/tours/{tour_id}")
+def edit_tour(tour_id: str, body: TourEdit):
+    """
+    Edit a tour in place.
+    - `remove`: Port names to drop; neighbours are reconnected and repaired locally
+    - `insert`: Port names to add at their cheapest insertion point, then repaired with local 2-opt
+    Only segments that changed are returned, alongside the new route & totals.
+    """
+    tour = get_tour_or_404(tour_id)
+
+    insert_list = [p.strip() for p in body.insert if p.strip()]
+    remove_list = [p.strip() for p in body.remove if p.strip()]
+    # Case-insensitive duplicates dropped, client order kept so the same edit always repairs the same way
+    removed = {}
+    for port_name in remove_list:
+        removed.setdefault(port_name.lower(), port_name)
+    new_stops = resolve_ports(insert_list) if insert_list else []
+
+    with tour.lock:
+        # Validate the whole edit first so a rejected request leaves the tour untouched
+        for port_name in removed.values():
+            if tour.index_of(port_name) is None:
+                raise HTTPException(status_code=400, detail=f"Port '{port_name}' is not part of this tour.")
+        inserted = set()
+        for stop in new_stops:
+            name = stop["name"].lower()
+            if name in inserted or (tour.index_of(name) is not None and name not in removed):
+                raise HTTPException(status_code=400, detail=f"Port '{stop['name']}' is already part of this tour.")
+            inserted.add(name)
+        if len(tour.ports) - len(removed) + len(new_stops) < 2:
+            raise HTTPException(status_code=400, detail="At least 2 ports are required.")
+
+        previous_edges = tour.edges()
+        for port_name in removed.values():
+            tour.remove(tour.index_of(port_name))
+        for stop in new_stops:
+            tour.insert(stop)
+
+        changed = [
+            tour_segment(tour, k) for k in range(len(tour.legs))
+            if (tour.ports[k]["name"], tour.ports[k + 1]["name"]) not in previous_edges
+        ]
+        return {**tour_summary(tour), "changed_segments": changed, "segment_count": len(tour.legs)}
+
+
+# 🔹 API to discard a tour
+@app.delete("/tours/{tour_id}")
+def delete_tour(tour_id: str):
+    if not tour_store.delete(tour_id):
+        raise HTTPException(status_code=404, detail=f"Tour '{tour_id}' not found.")
+    return {"message": f"Tour '{tour_id}' deleted."}
+
+
+# 🔹 API to inspect request coalescing & route cache counters
+@app.get("/debug/route-cache")
+def get_route_cache_stats():
+    """
+    Counters for the single-flight route cache.
+    - `coalesced`: Requests that waited on an identical in-flight computation
+    - `cache_hits`: Requests answered from the short-TTL result cache
+    """
+    return route_cache.stats()
+
+
+# 🔹 Function to guard the profiling endpoints with the PROFILE_TOKEN secret
+def require_profile_token(x_profile: Optional[str] = Header(None)):
+    if profiler.token is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set PROFILE_TOKEN to enable it.")
+    if not profiler.authorized(x_profile):
+        raise HTTPException(status_code=403, detail="Missing or invalid X-Profile token.")
+
+
+# 🔹 API to list recently captured request profiles
+@app.get("/debug/profiles", dependencies=[Depends(require_profile_token)])
+def get_profiles():
+    """
+    Recent profiles from the ring buffers (newest first), without their stacks.
+    """
+    return {
+        "armed_requests": profiler.armed,
+        "slow_threshold_ms": profiler.slow_threshold_ms,
+        "profiles": [
+            {k: v for k, v in p.items() if k != "stacks"} for p in profiler.snapshot()
+        ]
+    }
+
+
+# 🔹 API to fetch one profile as JSON or folded stacks
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+def get_profile(profile_id: int, format: str = Query("json", pattern="^(json|folded)$")):
+    """
+    Get a captured profile.
+    - `format`: `json`, or `folded` for flamegraph.pl / speedscope input
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found.")
+
+    if format == "folded":
+        lines = [f"{stack} {count}" for stack, count in sorted(profile["stacks"].items())]
+        return PlainTextResponse("\n".join(lines) + "\n")
+    return profile
+
+
+# 🔹 API to profile the next N requests
+@app.post("/debug/profiles/arm", dependencies=[Depends(require_profile_token)])
+def arm_profiler(requests: int = Query(1, ge=0, le=1000)):
+    profiler.arm(requests)
+    return {"armed_requests": profiler.armed}
+
+
+# 🔹 API to set the slow-request capture threshold
+@app.post("/debug/profiles/slow-threshold", dependencies=[Depends(require_profile_token)])
+def set_slow_threshold(ms: float = Query(..., ge=0)):
+    """
+    Capture stacks for every request slower than `ms` milliseconds (0 disables).
+    """
+    profiler.slow_threshold_ms = ms
+    return {"slow_threshold_ms": profiler.slow_threshold_ms}
 
 
 # 🔹 Function to optimize route using nearest neighbor algorithm
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+📊 Route Optimizer Benchmark - quality & runtime scoreboard for `optimize_route`.
+
+Builds a reproducible corpus of tours from `ports.db` (seeded random subsets, regional
+clusters and cross-ocean mixes), stores a reference tour length for each one, and
+scores solvers against it by gap-to-reference and wall time.
+
+Tours follow the API's semantics: open paths that start at the first port.
+
+Usage:
+    python benchmark_routes.py generate                      # (re)build benchmarks/route_corpus.json
+    python benchmark_routes.py run --output scoreboard.json  # score all solvers
+    python benchmark_routes.py run --solvers nearest_neighbor --max-mean-gap 15 --baseline old_scoreboard.json
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from apps import DB_PATH, calculate_distance, optimize_route
+from port_index import PortIndex, geodesic_km_arrays
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "route_corpus.json")
+
+# (category, size, seed) for every corpus instance
+CORPUS_SPEC = (
+    [("random", size, seed) for size in (5, 8, 10, 20, 50, 100) for seed in (1, 2, 3)]
+    + [("random", size, 1) for size in (200, 500, 1000)]
+    + [("regional", size, seed) for size in (10, 50, 200) for seed in (1, 2)]
+    + [("cross_ocean", size, seed) for size in (12, 60, 300) for seed in (1, 2)]
+)
+
+# Longitude bands used to build cross-ocean mixes
+OCEAN_REGIONS = {
+    "americas": (-180.0, -30.0),
+    "europe_africa": (-30.0, 60.0),
+    "asia_oceania": (60.0, 180.0),
+}
+
+EXACT_MAX_SIZE = 9  # Brute force with a fixed start: (n - 1)! orderings
+LOCAL_SEARCH_ROUNDS = 200  # Double-bridge kicks per best-known search
+
+# 🔹 Solvers under test: each takes [{"name", "coordinates"}] and returns them in visiting order
+SOLVERS = {
+    "nearest_neighbor": optimize_route,
+    "given_order": lambda ports: list(ports),
+}
+
+
+# 🔹 Function to load ports the way the API resolves them (first row per name)
+def load_ports():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, country, latitude, longitude FROM ports WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+    rows = cursor.fetchall()
+    conn.close()
+
+    seen = set()
+    ports = []
+    for row in rows:
+        if row[0].lower() not in seen:
+            seen.add(row[0].lower())
+            ports.append(row)
+    return ports
+
+
+# 🔹 Functions to sample each corpus category
+def sample_random(ports, size, rng):
+    return rng.sample(ports, size)
+
+
+def sample_regional(ports, size, rng):
+    index = PortIndex(ports)
+    by_name = {p[0]: p for p in ports}
+    center = rng.choice(ports)
+    radius = 100.0
+    while True:
+        nearby = index.within(center[2], center[3], radius)
+        if len(nearby) >= size:
+            cluster = [by_name[port["name"]] for port, _ in nearby[:size]]
+            rng.shuffle(cluster)
+            return cluster
+        radius *= 2
+
+
+def sample_cross_ocean(ports, size, rng):
+    regions = list(OCEAN_REGIONS.values())
+    picked = []
+    for k, (lo, hi) in enumerate(regions):
+        count = size // len(regions) + (1 if k < size % len(regions) else 0)
+        candidates = [p for p in ports if lo <= p[3] < hi]
+        picked.extend(rng.sample(candidates, count))
+    rng.shuffle(picked)
+    return picked
+
+
+SAMPLERS = {
+    "random": sample_random,
+    "regional": sample_regional,
+    "cross_ocean": sample_cross_ocean,
+}
+
+
+# 🔹 Function for an all-pairs distance matrix (vectorized WGS-84, within metres of geopy)
+def distance_matrix(coords):
+    lat = np.array([c[0] for c in coords])
+    lon = np.array([c[1] for c in coords])
+    return geodesic_km_arrays(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+# 🔹 Function to measure an open tour exactly as the API does
+def tour_length(route):
+    return math.fsum(
+        calculate_distance(route[k]["coordinates"], route[k + 1]["coordinates"]) for k in range(len(route) - 1)
+    )
+
+
+# 🔹 Function for the exact best tour of a small instance
+def exact_order(matrix):
+    n = len(matrix)
+    matrix = matrix.tolist()
+    best = None
+    for rest in itertools.permutations(range(1, n)):
+        order = (0,) + rest
+        length = sum(matrix[order[k]][order[k + 1]] for k in range(n - 1))
+        if best is None or length < best[0]:
+            best = (length, order)
+    return list(best[1])
+
+
+# 🔹 Function for 2-opt on an open tour with a fixed start
+def two_opt(order, matrix):
+    """
+    A zero-cost dummy stop after the last port lets the tour end anywhere, so every
+    move is the classic swap of legs (i, i+1) & (j, j+1) for (i, j) & (i+1, j+1).
+    """
+    n = len(matrix)
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = matrix
+    tour = np.array(list(order) + [n])
+    m = len(tour)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(m - 3):
+            a, b = tour[i], tour[i + 1]
+            js = tour[i + 2:m - 1]
+            nexts = tour[i + 3:m]
+            delta = padded[a, js] + padded[b, nexts] - padded[a, b] - padded[js, nexts]
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                j = i + 2 + k
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+    return tour[:-1].tolist()
+
+
+# 🔹 Function for a best-known tour: nearest neighbour, 2-opt, then iterated local search
+def best_known_order(matrix, rng):
+    n = len(matrix)
+    order = [0]
+    unvisited = set(range(1, n))
+    while unvisited:
+        nearest = min(unvisited, key=lambda k: matrix[order[-1], k])
+        order.append(nearest)
+        unvisited.remove(nearest)
+
+    def length(o):
+        return float(matrix[o[:-1], o[1:]].sum())
+
+    best = two_opt(order, matrix)
+    best_length = length(best)
+    for _ in range(LOCAL_SEARCH_ROUNDS):
+        # Double-bridge kick keeps the start fixed: A B C D -> A C B D
+        p1, p2, p3 = sorted(rng.sample(range(1, n), 3))
+        candidate = two_opt(best[:p1] + best[p2:p3] + best[p1:p2] + best[p3:], matrix)
+        candidate_length = length(candidate)
+        if candidate_length < best_length - 1e-9:
+            best, best_length = candidate, candidate_length
+    return best
+
+
+# 🔹 Function to build the benchmark corpus
+def generate_corpus(max_size=None):
+    ports = load_ports()
+    instances = []
+
+    for category, size, seed in CORPUS_SPEC:
+        if max_size is not None and size > max_size:
+            continue
+        rng = random.Random(f"{category}-{size}-{seed}")
+        picked = SAMPLERS[category](ports, size, rng)
+        route = [{"name": p[0], "coordinates": (p[2], p[3])} for p in picked]
+
+        started = time.perf_counter()
+        matrix = distance_matrix([stop["coordinates"] for stop in route])
+        if size <= EXACT_MAX_SIZE:
+            order, reference = exact_order(matrix), "optimal"
+        else:
+            order, reference = best_known_order(matrix, rng), "best_known"
+        reference_km = tour_length([route[k] for k in order])
+
+        instance_id = f"{category}-{size:04d}-s{seed}"
+        print(f"✅ {instance_id}: {reference} {reference_km:,.1f} km ({time.perf_counter() - started:.1f}s)")
+        instances.append({
+            "id": instance_id,
+            "category": category,
+            "size": size,
+            "seed": seed,
+            "reference": reference,
+            "reference_km": round(reference_km, 3),
+            "ports": [[stop["name"], stop["coordinates"][0], stop["coordinates"][1]] for stop in route],
+        })
+
+    return {"version": 1, "instances": instances}
+
+
+# 🔹 Function to score solvers against the corpus
+def run_benchmark(corpus, solver_names, max_size=None):
+    corpus_hash = hashlib.sha256(json.dumps(corpus["instances"], sort_keys=True).encode()).hexdigest()[:16]
+    scoreboard = {
+        "corpus_sha256": corpus_hash,
+        "max_size": max_size,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "solvers": {},
+    }
+
+    for name in solver_names:
+        solver = SOLVERS[name]
+        results = []
+        for instance in corpus["instances"]:
+            if max_size is not None and instance["size"] > max_size:
+                continue
+            route = [{"name": p[0], "coordinates": (p[1], p[2])} for p in instance["ports"]]
+
+            started = time.perf_counter()
+            solved = solver(route)
+            wall_time = time.perf_counter() - started
+
+            if sorted(stop["name"] for stop in solved) != sorted(stop["name"] for stop in route) or solved[0]["name"] != route[0]["name"]:
+                raise ValueError(f"Solver '{name}' returned an invalid tour for {instance['id']}")
+
+            length = tour_length(solved)
+            gap_pct = (length - instance["reference_km"]) / instance["reference_km"] * 100
+            results.append({
+                "id": instance["id"],
+                "category": instance["category"],
+                "size": instance["size"],
+                "reference_km": instance["reference_km"],
+                "length_km": round(length, 3),
+                "gap_pct": round(gap_pct, 3),
+                "wall_time_s": round(wall_time, 4),
+            })
+            print(f"   {name:<18} {instance['id']:<22} gap {gap_pct:7.2f}%  {wall_time:8.3f}s")
+
+        gaps = [r["gap_pct"] for r in results]
+        times = [r["wall_time_s"] for r in results]
+        scoreboard["solvers"][name] = {
+            "summary": {
+                "instances": len(results),
+                "mean_gap_pct": round(sum(gaps) / len(gaps), 3) if gaps else None,
+                "max_gap_pct": round(max(gaps), 3) if gaps else None,
+                "total_time_s": round(sum(times), 4),
+                "max_time_s": round(max(times), 4) if times else None,
+            },
+            "instances": results,
+        }
+
+    return scoreboard
+
+
+# 🔹 Function to gate a scoreboard on quality & latency
+def check_gates(scoreboard, max_mean_gap=None, max_total_seconds=None, baseline=None, gap_tolerance=0.5, time_tolerance=0.1):
+    failures = []
+    for name, entry in scoreboard["solvers"].items():
+        summary = entry["summary"]
+        if max_mean_gap is not None and summary["mean_gap_pct"] > max_mean_gap:
+            failures.append(f"{name}: mean gap {summary['mean_gap_pct']}% > {max_mean_gap}%")
+        if max_total_seconds is not None and summary["total_time_s"] > max_total_seconds:
+            failures.append(f"{name}: total time {summary['total_time_s']}s > {max_total_seconds}s")
+
+        previous = (baseline or {}).get("solvers", {}).get(name)
+        if previous is None:
+            continue
+        if (baseline.get("corpus_sha256"), baseline.get("max_size")) != (scoreboard["corpus_sha256"], scoreboard["max_size"]):
+            failures.append(f"{name}: baseline was produced on a different corpus or --max-size")
+            continue
+        if summary["mean_gap_pct"] > previous["summary"]["mean_gap_pct"] + gap_tolerance:
+            failures.append(f"{name}: mean gap rose from {previous['summary']['mean_gap_pct']}% to {summary['mean_gap_pct']}%")
+        if summary["total_time_s"] > previous["summary"]["total_time_s"] * (1 + time_tolerance):
+            failures.append(f"{name}: total time rose from {previous['summary']['total_time_s']}s to {summary['total_time_s']}s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route optimizers on a corpus built from ports.db.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Build the corpus and its reference tour lengths")
+    generate.add_argument("--corpus", default=CORPUS_PATH)
+    generate.add_argument("--max-size", type=int, default=None)
+
+    run = commands.add_parser("run", help="Score solvers and write a scoreboard")
+    run.add_argument("--corpus", default=CORPUS_PATH)
+    run.add_argument("--solvers", default=",".join(SOLVERS), help=f"Comma-separated subset of: {', '.join(SOLVERS)}")
+    run.add_argument("--max-size", type=int, default=None, help="Skip instances with more ports than this")
+    run.add_argument("--output", default="scoreboard.json")
+    run.add_argument("--max-mean-gap", type=float, default=None, help="Fail if any solver's mean gap exceeds this percentage")
+    run.add_argument("--max-total-seconds", type=float, default=None, help="Fail if any solver's total time exceeds this")
+    run.add_argument("--baseline", default=None, help="Earlier scoreboard to compare against")
+    run.add_argument("--gap-tolerance", type=float, default=0.5, help="Allowed rise in mean gap vs baseline, in percentage points")
+    run.add_argument("--time-tolerance", type=float, default=0.1, help="Allowed slowdown vs baseline (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        corpus = generate_corpus(args.max_size)
+        os.makedirs(os.path.dirname(os.path.abspath(args.corpus)), exist_ok=True)
+        with open(args.corpus, "w") as f:
+            json.dump(corpus, f, indent=1)
+        print(f"✅ Wrote {len(corpus['instances'])} instances to {args.corpus}")
+        return
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    solver_names = [s.strip() for s in args.solvers.split(",") if s.strip()]
+    unknown = [s for s in solver_names if s not in SOLVERS]
+    if unknown:
+        print(f"❌ Unknown solvers: {', '.join(unknown)}")
+        sys.exit(2)
+
+    scoreboard = run_benchmark(corpus, solver_names, args.max_size)
+    with open(args.output, "w") as f:
+        json.dump(scoreboard, f, indent=2)
+    for name, entry in scoreboard["solvers"].items():
+        summary = entry["summary"]
+        print(f"📊 {name}: mean gap {summary['mean_gap_pct']}%, max gap {summary['max_gap_pct']}%, total {summary['total_time_s']}s")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check_gates(
+        scoreboard, args.max_mean_gap, args.max_total_seconds, baseline, args.gap_tolerance, args.time_tolerance
+    )
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import json
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from port_index import EARTH_RADIUS_KM
+
+ECA_ZONES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eca_zones.json")
+ECA_STEP_KM = 50.0  # Sampling step along segments that may cross a zone
+BOUNDS_MARGIN_DEG = 0.5  # Covers the gap between the great circle and the WGS-84 geodesic
+
+
+# 🔹 Static R-tree over bounding boxes (Sort-Tile-Recursive bulk load)
+class RTree:
+    """
+    Read-only R-tree for (min_x, min_y, max_x, max_y, item) entries.
+    Built once with STR packing; `query` returns items whose boxes overlap a box.
+    """
+
+    NODE_CAPACITY = 8
+
+    def __init__(self, entries):
+        level = [(e[0], e[1], e[2], e[3], e[4], None) for e in entries]
+        while len(level) > self.NODE_CAPACITY:
+            level = self._pack(level)
+        self._root = self._node(level) if level else None
+
+    def _node(self, children):
+        return (
+            min(c[0] for c in children), min(c[1] for c in children),
+            max(c[2] for c in children), max(c[3] for c in children),
+            None, children,
+        )
+
+    def _pack(self, level):
+        # Sort into vertical slices by x, then tile each slice by y
+        nodes_needed = -(-len(level) // self.NODE_CAPACITY)
+        slices = max(int(nodes_needed ** 0.5), 1)
+        slice_size = -(-len(level) // slices)
+        by_x = sorted(level, key=lambda e: e[0] + e[2])
+
+        packed = []
+        for start in range(0, len(by_x), slice_size):
+            column = sorted(by_x[start:start + slice_size], key=lambda e: e[1] + e[3])
+            for k in range(0, len(column), self.NODE_CAPACITY):
+                packed.append(self._node(column[k:k + self.NODE_CAPACITY]))
+        return packed
+
+    def query(self, min_x, min_y, max_x, max_y):
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            if node[0] > max_x or node[2] < min_x or node[1] > max_y or node[3] < min_y:
+                continue
+            if node[5] is None:
+                found.append(node[4])
+            else:
+                stack.extend(node[5])
+        return found
+
+
+# 🔹 One emission control area with an indexed boundary
+class EcaZone:
+    def __init__(self, name, regulation, ring):
+        self.name = name
+        self.regulation = regulation
+        self.ring = [(float(x), float(y)) for x, y in ring]
+        if self.ring[0] != self.ring[-1]:
+            self.ring.append(self.ring[0])
+
+        ring = np.array(self.ring)
+        self.edge_starts, self.edge_ends = ring[:-1], ring[1:]
+        self.bbox = tuple(ring.min(axis=0)) + tuple(ring.max(axis=0))
+        self.edges = RTree([
+            (min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1]), k)
+            for k, (a, b) in enumerate(zip(self.ring[:-1], self.ring[1:]))
+        ])
+
+    def contains(self, x, y):
+        # Ray casting to +x; only edges spanning the ray's latitude can cross it
+        inside = False
+        for k in self.edges.query(x, y, self.bbox[2], y):
+            (x1, y1), (x2, y2) = self.edge_starts[k], self.edge_ends[k]
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def crossings(self, chords, x1, y1, x2, y2):
+        """
+        Path parameters (chord index + t, t in (0, 1]) where chords (x1, y1) -> (x2, y2) cross the
+        boundary, sorted. One R-tree query fetches the edges near all chords; the clipping is vectorized.
+        """
+        edges = self.edges.query(
+            min(x1.min(), x2.min()), min(y1.min(), y2.min()), max(x1.max(), x2.max()), max(y1.max(), y2.max())
+        )
+        if not edges:
+            return np.empty(0)
+
+        ax, ay = self.edge_starts[edges, 0], self.edge_starts[edges, 1]
+        ex, ey = self.edge_ends[edges, 0] - ax, self.edge_ends[edges, 1] - ay
+        dx, dy = (x2 - x1)[:, None], (y2 - y1)[:, None]
+        ox, oy = ax - x1[:, None], ay - y1[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denominator = dx * ey - dy * ex
+            t = (ox * ey - oy * ex) / denominator
+            u = (ox * dy - oy * dx) / denominator
+        hits = (denominator != 0) & (t > 0) & (t <= 1) & (u >= 0) & (u < 1)
+        return np.sort((chords[:, None] + t)[hits])
+
+
+# 🔹 Function to load the bundled ECA polygons
+@lru_cache(maxsize=1)
+def load_eca_zones(path=ECA_ZONES_PATH):
+    with open(path) as f:
+        features = json.load(f)["features"]
+    return tuple(
+        EcaZone(feature["properties"]["name"], feature["properties"]["regulation"], feature["geometry"]["coordinates"][0])
+        for feature in features
+    )
+
+
+# 🔹 Function for a great circle's lat/lon bounds, without sampling it
+def great_circle_bounds(start, end):
+    """
+    (min_lon, min_lat, max_lon, max_lat) of the great circle from `start` to `end`, padded by
+    `BOUNDS_MARGIN_DEG`. Longitude runs monotonically from `start` and may leave [-180, 180].
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (start[0], start[1], end[0], end[1]))
+    dlon = (lon2 - lon1 + math.pi) % (2 * math.pi) - math.pi
+    min_lat, max_lat = min(lat1, lat2), max(lat1, lat2)
+
+    # The vertex (highest |latitude|) is only on the segment if the course turns poleward-to-equatorward
+    azimuth1 = math.atan2(math.sin(dlon) * math.cos(lat2), math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon))
+    azimuth2 = math.atan2(math.sin(dlon) * math.cos(lat1), -math.cos(lat2) * math.sin(lat1) + math.sin(lat2) * math.cos(lat1) * math.cos(dlon))
+    if math.cos(azimuth1) > 0 > math.cos(azimuth2) or math.cos(azimuth1) < 0 < math.cos(azimuth2):
+        vertex = math.acos(min(1.0, abs(math.sin(azimuth1) * math.cos(lat1))))
+        if math.cos(azimuth1) > 0:
+            max_lat = vertex
+        else:
+            min_lat = -vertex
+
+    lon_a, lon_b = math.degrees(lon1), math.degrees(lon1 + dlon)
+    return (
+        min(lon_a, lon_b) - BOUNDS_MARGIN_DEG, math.degrees(min_lat) - BOUNDS_MARGIN_DEG,
+        max(lon_a, lon_b) + BOUNDS_MARGIN_DEG, math.degrees(max_lat) + BOUNDS_MARGIN_DEG,
+    )
+
+
+# 🔹 Function to sample a great circle every `step_km` (vectorized)
+def great_circle_points(start, end, step_km=ECA_STEP_KM):
+    lat1, lon1, lat2, lon2 = np.radians([start[0], start[1], end[0], end[1]])
+    a = np.array([np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)])
+    b = np.array([np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2)])
+    omega = math.acos(min(1.0, max(-1.0, float(a @ b))))
+    steps = max(int(omega * EARTH_RADIUS_KM / step_km), 1)
+
+    t = np.linspace(0.0, 1.0, steps + 1)[:, None]
+    if omega < 1e-12:
+        points = np.repeat(a[None, :], steps + 1, axis=0)
+    else:
+        points = (np.sin((1 - t) * omega) * a + np.sin(t * omega) * b) / math.sin(omega)
+    lats = np.degrees(np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1])))
+    lons = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    return lons, lats
+
+
+# 🔹 Function for the share of a segment sailed inside each ECA (cached per port pair)
+@lru_cache(maxsize=16384)
+def eca_fractions(start, end):
+    """
+    Fraction of the route from `start` to `end` inside each zone, as ((name, fraction), ...).
+    Zones are rejected first against the great circle's bounds, so most segments never get sampled.
+    Segments that may touch a zone are sampled every `ECA_STEP_KM` (within a few km of the
+    WGS-84 geodesic), and only chords overlapping the zone's box are clipped against its boundary.
+    The path is inside between alternate crossings, starting from whether the first point is inside.
+    """
+    min_x, min_y, max_x, max_y = great_circle_bounds(start, end)
+    zones = [
+        zone for zone in load_eca_zones()
+        if zone.bbox[1] <= max_y and zone.bbox[3] >= min_y and any(
+            zone.bbox[0] + shift <= max_x and zone.bbox[2] + shift >= min_x for shift in (-360.0, 0.0, 360.0)
+        )
+    ]
+    if not zones:
+        return ()
+
+    xs, ys = great_circle_points(start, end)
+    chords = len(xs) - 1
+    x1, y1, x2, y2 = xs[:-1], ys[:-1], xs[1:], ys[1:]
+    # Chords across the antimeridian are skipped: no zone comes near it, so they never cross a boundary
+    low_x, high_x = np.minimum(x1, x2), np.maximum(x1, x2)
+    low_y, high_y = np.minimum(y1, y2), np.maximum(y1, y2)
+    plain = high_x - low_x <= 180
+
+    fractions = []
+    for zone in zones:
+        zx1, zy1, zx2, zy2 = zone.bbox
+        touching = np.nonzero(plain & (high_x >= zx1) & (low_x <= zx2) & (high_y >= zy1) & (low_y <= zy2))[0]
+        if len(touching) == 0:
+            continue
+
+        bounds = np.concatenate((
+            [0.0],
+            zone.crossings(touching, x1[touching], y1[touching], x2[touching], y2[touching]),
+            [float(chords)],
+        ))
+        first_inside = 0 if zone.contains(xs[0], ys[0]) else 1
+        inside_chords = np.diff(bounds)[first_inside::2].sum()
+
+        if inside_chords > 0:
+            fractions.append((zone.name, float(inside_chords / chords)))
+    return tuple(fractions)
@@ -0,0 +1,117 @@
+import base64
+import struct
+from functools import lru_cache
+
+from geographiclib.geodesic import Geodesic
+
+DENSIFY_KM = 25.0  # Spacing of waypoints along each geodesic
+MAX_SEGMENT_POINTS = 1024
+TILE_SIZE_PX = 256
+GEOMETRY_ENCODINGS = ("polyline", "float32")
+
+
+# 🔹 Function to densify one segment into geodesic waypoints (cached per port pair)
+@lru_cache(maxsize=4096)
+def segment_waypoints(start, end):
+    """
+    (lat, lon) waypoints along the WGS-84 geodesic from `start` to `end`.
+    Longitudes are unwrapped so a segment crossing the antimeridian stays continuous:
+    the first point has `start`'s longitude, the last may differ from `end`'s by a multiple of 360°.
+    """
+    line = Geodesic.WGS84.InverseLine(start[0], start[1], end[0], end[1])
+    steps = min(max(int(line.s13 / 1000 / DENSIFY_KM), 1), MAX_SEGMENT_POINTS - 1)
+
+    points = []
+    for k in range(steps + 1):
+        position = line.Position(line.s13 * k / steps, Geodesic.STANDARD | Geodesic.LONG_UNROLL)
+        points.append((position["lat2"], position["lon2"]))
+    return tuple(points)
+
+
+# 🔹 Function to simplify a polyline with Douglas–Peucker
+def simplify(points, tolerance):
+    """
+    Keep the points that deviate more than `tolerance` degrees from the simplified line.
+    """
+    if len(points) <= 2 or tolerance <= 0:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (y1, x1), (y2, x2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        farthest, max_dist_sq = None, tolerance * tolerance
+        for k in range(first + 1, last):
+            y, x = points[k]
+            if length_sq == 0:
+                dist_sq = (x - x1) ** 2 + (y - y1) ** 2
+            else:
+                t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length_sq))
+                dist_sq = (x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2
+            if dist_sq > max_dist_sq:
+                farthest, max_dist_sq = k, dist_sq
+
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+# 🔹 Function for the simplification tolerance of a map zoom level (about one pixel)
+def zoom_tolerance(zoom):
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+# 🔹 Function to encode points as a Google encoded polyline
+def encode_polyline(points, precision=5):
+    factor = 10 ** precision
+    output = []
+    previous_lat = previous_lon = 0
+    for lat, lon in points:
+        lat_i, lon_i = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat_i - previous_lat, lon_i - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        previous_lat, previous_lon = lat_i, lon_i
+    return "".join(output)
+
+
+# 🔹 Function to encode points as base64 little-endian float32 [lat, lon, lat, lon, ...]
+def encode_float32(points):
+    flat = [value for point in points for value in point]
+    return base64.b64encode(struct.pack(f"<{len(flat)}f", *flat)).decode("ascii")
+
+
+# 🔹 Function for the longitude shifts that keep a whole route's geometry continuous
+def route_longitude_offsets(coordinates):
+    """
+    Multiple of 360° to add to each segment's longitudes so it starts where the previous segment ended.
+    The first segment starts at the first port's own longitude; later ones may leave [-180, 180].
+    """
+    offsets = []
+    offset = 0.0
+    for start, end in zip(coordinates[:-1], coordinates[1:]):
+        offsets.append(offset)
+        unrolled_end = segment_waypoints(start, end)[-1][1] + offset
+        offset = 360.0 * round((unrolled_end - end[1]) / 360.0)
+    return offsets
+
+
+# 🔹 Function for a segment's simplified & encoded geometry (cached per port pair, zoom, encoding and shift)
+@lru_cache(maxsize=16384)
+def segment_geometry(start, end, zoom, encoding, lon_offset=0.0):
+    points = simplify(segment_waypoints(start, end), zoom_tolerance(zoom))
+    if lon_offset:
+        points = [(lat, lon + lon_offset) for lat, lon in points]
+    encoded = encode_polyline(points) if encoding == "polyline" else encode_float32(points)
+    return encoded, len(points)
@@ -0,0 +1,259 @@
+import math
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# Haversine and WGS-84 distances differ by well under this fraction
+HAVERSINE_MARGIN = 0.01
+
+
+# 🔹 Cheap spherical distance used to screen candidates before exact geodesics
+def haversine_km(coord1, coord2):
+    lat1, lon1 = math.radians(coord1[0]), math.radians(coord1[1])
+    lat2, lon2 = math.radians(coord2[0]), math.radians(coord2[1])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# 🔹 Function for vectorized WGS-84 distances
+def geodesic_km_arrays(lat1, lon1, lat2, lon2):
+    """
+    Lambert's ellipsoidal formula: within metres of geopy's geodesic, but vectorized,
+    so bulk distances agree with `calculate_distance` used by the API.
+    """
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    dlon = np.radians(lon2) - np.radians(lon1)
+    a = np.sin((beta2 - beta1) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin(dlon / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma > 0, distance, 0.0)
+
+
+# 🔹 Grid spatial index over the ports table
+class PortIndex:
+    """
+    Ports bucketed into fixed lat/lon cells.
+    - `within`: ports inside a radius, visiting only cells that overlap the circle's bounding box
+    - `nearest`: closest port, widening the search radius until one is found
+    - `reachable`: ports within a range, optionally through intermediate stops (WGS-84 distances)
+    - `lookup`: port by name
+    Distances from `within` and `nearest` are haversine; refine with exact geodesics where it matters.
+    """
+
+    CELL_DEGREES = 1.0
+    NEAREST_RADII_KM = (25, 100, 500, 2500, math.pi * EARTH_RADIUS_KM)
+    HOP_GROUP_DEGREES = 4.0  # Stops expanded together in a multi-hop layer share a cell this size
+
+    def __init__(self, ports):
+        self.ports = [
+            {"index": k, "name": name, "country": country, "coordinates": (lat, lon)}
+            for k, (name, country, lat, lon) in enumerate(ports)
+        ]
+        self.lats = np.array([p["coordinates"][0] for p in self.ports], dtype=float)
+        self.lons = np.array([p["coordinates"][1] for p in self.ports], dtype=float)
+
+        # Unit vectors on Lambert's auxiliary sphere, so leg matrices reduce to one matrix product
+        beta = np.arctan((1 - WGS84_F) * np.tan(np.radians(self.lats)))
+        lon = np.radians(self.lons)
+        self._sin_beta = np.sin(beta)
+        self._unit = np.column_stack((np.cos(beta) * np.cos(lon), np.cos(beta) * np.sin(lon), self._sin_beta))
+        self._cells = defaultdict(list)
+        self._by_name = {}
+        for port in self.ports:
+            self._cells[self._cell(*port["coordinates"])].append(port)
+            self._by_name.setdefault(port["name"].lower(), port)
+
+    @classmethod
+    def from_database(cls, db_path):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, country, latitude, longitude FROM ports WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+        ports = cursor.fetchall()
+        conn.close()
+        return cls(ports)
+
+    def lookup(self, name):
+        # First port with this name, matching how `get_port_details` resolves names
+        return self._by_name.get(name.lower())
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.CELL_DEGREES), math.floor(((lon + 180) % 360) / self.CELL_DEGREES))
+
+    def _candidate_cells(self, lat, lon, radius_km):
+        # Bounding box of a spherical cap: latitude band, then the widest longitude span inside it
+        angular = radius_km / EARTH_RADIUS_KM
+        lat_r = math.radians(lat)
+        min_lat, max_lat = lat_r - angular, lat_r + angular
+
+        if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2 or angular >= math.pi / 2:
+            lon_span = 180.0
+        else:
+            lon_span = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(lat_r))))
+
+        cols_total = int(round(360 / self.CELL_DEGREES))
+        row_lo = math.floor(max(math.degrees(min_lat), -90) / self.CELL_DEGREES)
+        row_hi = math.floor(min(math.degrees(max_lat), 90) / self.CELL_DEGREES)
+
+        if lon_span >= 180.0:
+            cols = range(cols_total)
+        else:
+            col_lo = math.floor(((lon - lon_span) + 180) / self.CELL_DEGREES)
+            col_hi = math.floor(((lon + lon_span) + 180) / self.CELL_DEGREES)
+            cols = {col % cols_total for col in range(col_lo, col_hi + 1)}
+
+        for row in range(row_lo, row_hi + 1):
+            for col in cols:
+                cell = self._cells.get((row, col))
+                if cell:
+                    yield cell
+
+    def within(self, lat, lon, radius_km):
+        """
+        Ports within `radius_km` of (lat, lon) as (port, haversine_km) pairs, nearest first.
+        """
+        origin = (lat, lon)
+        found = []
+        for cell in self._candidate_cells(lat, lon, radius_km):
+            for port in cell:
+                distance = haversine_km(origin, port["coordinates"])
+                if distance <= radius_km:
+                    found.append((port, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, lat, lon, max_km=None):
+        """
+        Closest port to (lat, lon) as (port, haversine_km), or None if none lies within `max_km`.
+        """
+        for radius in self.NEAREST_RADII_KM:
+            if max_km is not None and radius > max_km:
+                radius = max_km
+            found = self.within(lat, lon, radius)
+            if found:
+                return found[0]
+            if max_km is not None and radius >= max_km:
+                return None
+        return None
+
+    def _leg_matrix(self, stops, targets, max_km):
+        """
+        WGS-84 distances from every port in `stops` to every port in `targets`, inf beyond `max_km`.
+        Lambert's formula as in `geodesic_km_arrays`, rewritten for the precomputed unit vectors:
+        one matrix product screens all pairs, and only pairs that may be in range pay for the trig.
+        """
+        a = np.clip((1 - self._unit[stops] @ self._unit[targets].T) / 2, 0.0, 1.0)  # sin²(σ/2)
+        max_sigma = min(max_km * (1 + HAVERSINE_MARGIN) / (WGS84_A_KM * (1 - WGS84_F)), math.pi)
+        rows, cols = np.nonzero(a <= math.sin(max_sigma / 2) ** 2)
+        a = a[rows, cols]
+
+        sigma = 2 * np.arcsin(np.sqrt(a))
+        sin_sigma = 2 * np.sqrt(a * (1 - a))
+        sin_stops, sin_targets = self._sin_beta[stops[rows]], self._sin_beta[targets[cols]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = (sigma - sin_sigma) * (sin_stops + sin_targets) ** 2 / (4 * (1 - a))
+            y = (sigma + sin_sigma) * (sin_targets - sin_stops) ** 2 / (4 * a)
+            distance = np.where(a > 0, WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y)), 0.0)
+
+        legs = np.full((len(stops), len(targets)), np.inf)
+        legs[rows, cols] = np.where(distance <= max_km, distance, np.inf)
+        return legs
+
+    def _box_mask(self, stops, radius_km, lats, lons):
+        # Targets inside the bounding box of all circles of `radius_km` around `stops`
+        angular = radius_km * (1 + HAVERSINE_MARGIN) / EARTH_RADIUS_KM
+        stop_lats, stop_lons = self.lats[stops], self.lons[stops]
+        lat_lo = stop_lats.min() - math.degrees(angular)
+        lat_hi = stop_lats.max() + math.degrees(angular)
+        mask = (lats >= lat_lo) & (lats <= lat_hi)
+
+        widest = math.radians(max(abs(stop_lats.min()), abs(stop_lats.max())))
+        if lat_lo <= -90 or lat_hi >= 90 or angular >= math.pi / 2 or math.sin(angular) >= math.cos(widest):
+            return mask
+        lon_span = math.degrees(math.asin(math.sin(angular) / math.cos(widest)))
+        lon_lo = stop_lons.min() - lon_span
+        width = stop_lons.max() - stop_lons.min() + 2 * lon_span
+        if width >= 360:
+            return mask
+        return mask & (((lons - lon_lo) % 360) <= width)
+
+    def reachable(self, lat, lon, range_km, max_stops=0, exclude=None):
+        """
+        Ports reachable from (lat, lon) with legs no longer than `range_km`.
+        Direct hops use the grid with a haversine margin, then exact WGS-84 distances.
+        Each extra stop expands the previous layer's new ports, cell by cell, against the unreached
+        ports near that cell, keeping the fewest stops first and the shortest total distance second.
+        Returns (port, total_km, [stop indices]) tuples.
+        """
+        n = len(self.ports)
+        total = np.full(n, np.inf)
+        parent = np.full(n, -1)
+        reached = np.zeros(n, dtype=bool)
+        if exclude is not None:
+            reached[exclude] = True
+
+        candidates = np.array(
+            [port["index"] for port, _ in self.within(lat, lon, range_km * (1 + HAVERSINE_MARGIN))], dtype=int
+        )
+        if len(candidates):
+            candidates = candidates[~reached[candidates]]
+            distances = geodesic_km_arrays(lat, lon, self.lats[candidates], self.lons[candidates])
+            frontier = candidates[distances <= range_km]
+            total[frontier] = distances[distances <= range_km]
+            reached[frontier] = True
+        else:
+            frontier = candidates
+
+        for _ in range(max_stops):
+            unreached = np.nonzero(~reached)[0]
+            if len(frontier) == 0 or len(unreached) == 0:
+                break
+
+            # Stops are expanded cell by cell: each cell's bounding box stays tight, and cells deep
+            # inside the reached area have no unreached targets in range, so they cost one mask
+            cells = (
+                np.floor(self.lats[frontier] / self.HOP_GROUP_DEGREES) * 360
+                + np.floor((self.lons[frontier] + 180) / self.HOP_GROUP_DEGREES)
+            )
+            order = np.argsort(cells, kind="stable")
+            frontier, cells = frontier[order], cells[order]
+            target_lats, target_lons = self.lats[unreached], self.lons[unreached]
+            best = np.full(len(unreached), np.inf)
+            best_parent = np.full(len(unreached), -1)
+            for stops in np.split(frontier, np.nonzero(np.diff(cells))[0] + 1):
+                targets = np.nonzero(self._box_mask(stops, range_km, target_lats, target_lons))[0]
+                if len(targets) == 0:
+                    continue
+                via = total[stops][:, None] + self._leg_matrix(stops, unreached[targets], range_km)
+                row = via.argmin(axis=0)
+                cost = via[row, np.arange(len(targets))]
+                better = cost < best[targets]
+                best[targets[better]] = cost[better]
+                best_parent[targets[better]] = stops[row[better]]
+
+            found = np.isfinite(best)
+            frontier = unreached[found]
+            total[frontier] = best[found]
+            parent[frontier] = best_parent[found]
+            reached[frontier] = True
+
+        results = []
+        for k in np.nonzero(np.isfinite(total))[0]:
+            path = []
+            stop = parent[k]
+            while stop >= 0:
+                path.append(int(stop))
+                stop = parent[stop]
+            results.append((self.ports[k], float(total[k]), path[::-1]))
+        return results
@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import functools
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+
+_current_session = contextvars.ContextVar("profile_session", default=None)
+
+
+# 🔹 Samples collected for one request
+class ProfileSession:
+    def __init__(self, session_id, method, path, query, reason):
+        self.id = session_id
+        self.method = method
+        self.path = path
+        self.query = query
+        self.reason = reason  # "armed", "header" or "slow"
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.thread_ids = set()
+        self.stacks = Counter()
+        self.samples = 0
+
+    @contextmanager
+    def attached(self):
+        thread_id = threading.get_ident()
+        self.thread_ids.add(thread_id)
+        try:
+            yield
+        finally:
+            self.thread_ids.discard(thread_id)
+
+
+# 🔹 On-demand sampling profiler with slow-request capture
+class SamplingProfiler:
+    """
+    Stack sampler for request handlers.
+    - `arm(n)`: profile the next n requests
+    - `X-Profile: <token>` request header: profile that request (only when a token is configured)
+    - `slow_threshold_ms`: sample every request and keep the ones slower than this
+    Finished profiles go into ring buffers as folded stacks (flamegraph.pl / speedscope format);
+    slow captures have their own buffer so on-demand profiles can't evict them.
+    With nothing armed and no threshold set, requests only pay for a couple of attribute checks.
+    """
+
+    HEADER = b"x-profile"
+
+    def __init__(self, interval_ms=5.0, slow_threshold_ms=0.0, max_profiles=50, token=None):
+        self.interval = interval_ms / 1000.0
+        self.slow_threshold_ms = slow_threshold_ms
+        self.token = token or None
+        self.armed = 0
+        self.profiles = deque(maxlen=max_profiles)
+        self.slow_profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wake = threading.Event()
+        self._sampler = None
+        self._stop_codes = set()
+
+    @property
+    def enabled(self):
+        return self.armed > 0 or self.slow_threshold_ms > 0
+
+    def authorized(self, token):
+        # Header captures & admin endpoints stay off unless a token is configured
+        if self.token is None or not token:
+            return False
+        return hmac.compare_digest(token.encode("latin-1"), self.token.encode("latin-1"))
+
+    def arm(self, requests):
+        with self._lock:
+            self.armed = max(requests, 0)
+
+    def begin(self, method, path, query, header_requested):
+        reason = None
+        with self._lock:
+            if header_requested:
+                reason = "header"
+            elif self.armed > 0:
+                self.armed -= 1
+                reason = "armed"
+            elif self.slow_threshold_ms > 0:
+                reason = "slow"
+            if reason is None:
+                return None
+
+            session = ProfileSession(next(self._ids), method, path, query, reason)
+            self._active[session.id] = session
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._sampler.start()
+        self._wake.set()
+        return session
+
+    def end(self, session, status_code):
+        duration_ms = (time.perf_counter() - session.started) * 1000
+        with self._lock:
+            self._active.pop(session.id, None)
+
+        if session.reason == "slow" and duration_ms < self.slow_threshold_ms:
+            return
+        profile = {
+            "id": session.id,
+            "method": session.method,
+            "path": session.path,
+            "query": session.query,
+            "status_code": status_code,
+            "reason": session.reason,
+            "started_at": session.started_at,
+            "duration_ms": round(duration_ms, 2),
+            "samples": session.samples,
+            "interval_ms": self.interval * 1000,
+            "stacks": dict(session.stacks),
+        }
+        with self._lock:
+            (self.slow_profiles if session.reason == "slow" else self.profiles).append(profile)
+
+    def snapshot(self):
+        # Copy under the lock: `end` appends from the event loop while handlers read from worker threads
+        with self._lock:
+            profiles = list(self.profiles) + list(self.slow_profiles)
+        profiles.sort(key=lambda p: p["id"], reverse=True)
+        return profiles
+
+    def get(self, profile_id):
+        return next((p for p in self.snapshot() if p["id"] == profile_id), None)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                sessions = list(self._active.values())
+            if not sessions:
+                self._wake.wait()
+                continue
+
+            frames = sys._current_frames()
+            for session in sessions:
+                for thread_id in list(session.thread_ids):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        session.stacks[self._fold(frame)] += 1
+                        session.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _fold(self, frame):
+        # Root-first "func (file:line);..." stopping at the route wrapper
+        labels = []
+        while frame is not None and frame.f_code not in self._stop_codes:
+            code = frame.f_code
+            labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def wrap_endpoint(self, endpoint):
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def profiled(*args, **kwargs):
+                session = _current_session.get()
+                if session is None:
+                    return await endpoint(*args, **kwargs)
+                with session.attached():
+                    return await endpoint(*args, **kwargs)
+        else:
+            @functools.wraps(endpoint)
+            def profiled(*args, **kwargs):
+                session = _current_session.get()
+                if session is None:
+                    return endpoint(*args, **kwargs)
+                with session.attached():
+                    return endpoint(*args, **kwargs)
+
+        self._stop_codes.add(profiled.__code__)
+        return profiled
+
+    def route_class(self):
+        profiler = self
+
+        # Route class that tags the thread running each handler, so the sampler knows whose stacks to take
+        class ProfiledRoute(APIRoute):
+            def __init__(self, path, endpoint, **kwargs):
+                super().__init__(path, profiler.wrap_endpoint(endpoint), **kwargs)
+
+        return ProfiledRoute
+
+
+# 🔹 ASGI middleware that opens a profile session for selected requests
+class ProfilingMiddleware:
+    def __init__(self, app, profiler, exclude_prefix="/debug/profiles"):
+        self.app = app
+        self.profiler = profiler
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            return await self.app(scope, receive, send)
+
+        header_requested = self.profiler.token is not None and any(
+            name == SamplingProfiler.HEADER and self.profiler.authorized(value.decode("latin-1"))
+            for name, value in scope["headers"]
+        )
+        if not header_requested and not self.profiler.enabled:
+            return await self.app(scope, receive, send)
+
+        session = self.profiler.begin(
+            scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"), header_requested
+        )
+        if session is None:
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _current_session.set(session)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_session.reset(token)
+            self.profiler.end(session, status_code)
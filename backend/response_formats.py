@@ -0,0 +1,119 @@
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Listed in requirements.txt; the stdlib C encoder covers stripped-down installs
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Listed in requirements.txt; without it MessagePack requests get a 406
+    msgpack = None
+
+JSON_MEDIA_TYPES = ("application/json", "application/*", "*/*")
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+LAYOUTS = ("records", "columnar")
+
+
+# 🔹 Tabular result kept as row tuples until the response layout is known
+class Table:
+    """
+    Rows as tuples plus their column names, so handlers never build per-row dicts.
+    - `records`: a list of objects, the classic layout
+    - `columnar`: one parallel array per column
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def records(self):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def columnar(self):
+        values = list(zip(*self.rows)) or [()] * len(self.columns)
+        return dict(zip(self.columns, values))
+
+
+# 🔹 Function to parse an Accept header into (media_type, params) entries, best first
+def parse_accept(header):
+    entries = []
+    for order, part in enumerate(header.split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        if not media_type:
+            continue
+        options = {}
+        for param in params:
+            key, _, value = param.partition("=")
+            options[key.strip().lower()] = value.strip().strip('"').lower()
+        try:
+            quality = float(options.pop("q", "1"))
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            entries.append((quality, -order, media_type.lower(), options))
+    entries.sort(reverse=True)
+    return [(media_type, options) for _, _, media_type, options in entries]
+
+
+# 🔹 Function to pick the response format & layout for a request's Accept header
+def negotiate(request):
+    """
+    Returns ("json" | "msgpack", "records" | "columnar"); raises 406 if nothing offered is supported.
+    The layout comes from a `layout=columnar` media type parameter, e.g. `application/msgpack; layout=columnar`.
+    Call it before doing any work, so unacceptable requests fail fast.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return "json", "records"
+
+    for media_type, options in parse_accept(accept):
+        layout = options.get("layout", "records")
+        if layout not in LAYOUTS:
+            continue
+        if media_type in JSON_MEDIA_TYPES:
+            return "json", layout
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            return "msgpack", layout
+
+    supported = "application/json" + (", application/msgpack" if msgpack is not None else "")
+    raise HTTPException(status_code=406, detail=f"Not acceptable. Supported media types: {supported}")
+
+
+# 🔹 Function to serialize JSON with the fastest encoder available
+def dump_json(content):
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# 🔹 Function to build the negotiated response for a payload that may hold Tables
+def negotiated_response(response_format, payload):
+    """
+    Encode `payload` in the format picked by `negotiate`.
+    Top-level `Table` values are laid out as records or columns; the payload itself is not modified,
+    so cached results can be returned as-is. Payloads without a Table are always sent as-is.
+    """
+    kind, layout = response_format
+    content = {}
+    tabular = False
+    for key, value in payload.items():
+        if isinstance(value, Table):
+            value, tabular = getattr(value, layout)(), True
+        content[key] = value
+
+    if kind == "msgpack":
+        body, media_type = msgpack.packb(content, use_bin_type=True), "application/msgpack"
+    else:
+        body, media_type = dump_json(content), "application/json"
+    if tabular and layout == "columnar":
+        media_type += "; layout=columnar"
+
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# 🔹 One in-flight computation that concurrent callers can wait on
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# 🔹 Single-flight layer with a short-TTL result cache
+class CoalescingCache:
+    """
+    Share route computations between identical requests.
+    - Concurrent callers with the same key wait on one in-flight computation
+    - Finished results are kept for `ttl` seconds to absorb bursty refreshes
+    - Errors are shared with waiting callers but never cached
+    """
+
+    def __init__(self, ttl=5.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = OrderedDict()  # key -> (expires_at, result)
+        self.computed = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def get_or_compute(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > now:
+                self.cache_hits += 1
+                return cached[1]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._inflight[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None:
+                    self.computed += 1
+                    self._store(key, call.result)
+            call.done.set()
+
+        return call.result
+
+    def _store(self, key, result):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        self._results[key] = (now + self.ttl, result)
+        self._results.move_to_end(key)
+
+        # Drop expired entries first, then the oldest ones if still too large
+        for stale_key in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[stale_key]
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "computed": self.computed,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "in_flight": len(self._inflight),
+                "cached_entries": len(self._results),
+                "ttl_seconds": self.ttl,
+            }
@@ -0,0 +1,159 @@
+import math
+import threading
+import uuid
+from collections import OrderedDict
+
+from port_index import haversine_km
+
+
+# 🔹 An optimized tour that can be edited without a full re-solve
+class Tour:
+    """
+    Open tour (fixed starting port) with cached leg distances.
+    - `insert`: cheapest insertion, screened with haversine and confirmed with exact distances
+    - `remove`: splice the port out and reconnect its neighbours
+    Both finish with a 2-opt repair limited to a window around the change, so the
+    number of exact distance calls per edit does not grow with tour length.
+    """
+
+    INSERTION_CANDIDATES = 4
+    REPAIR_WINDOW = 3
+    MAX_REPAIR_PASSES = 8
+
+    def __init__(self, tour_id, ports, ship_type, distance):
+        self.id = tour_id
+        self.ports = list(ports)  # [{"name": ..., "coordinates": (lat, lon)}]
+        self.ship_type = ship_type
+        self.lock = threading.Lock()
+        self._distance = distance
+        self.legs = [
+            distance(self.ports[k]["coordinates"], self.ports[k + 1]["coordinates"])
+            for k in range(len(self.ports) - 1)
+        ]
+
+    def index_of(self, port_name):
+        port_name = port_name.lower()
+        for k, port in enumerate(self.ports):
+            if port["name"].lower() == port_name:
+                return k
+        return None
+
+    def total_distance(self):
+        return math.fsum(self.legs)
+
+    def edges(self):
+        return {(self.ports[k]["name"], self.ports[k + 1]["name"]) for k in range(len(self.legs))}
+
+    def insert(self, port):
+        n = len(self.ports)
+        coords = port["coordinates"]
+
+        # Screen every insertion point with haversine, then refine the best few exactly
+        def screened_cost(p):
+            prev = self.ports[p - 1]["coordinates"]
+            if p == n:
+                return haversine_km(prev, coords)
+            nxt = self.ports[p]["coordinates"]
+            return haversine_km(prev, coords) + haversine_km(coords, nxt) - haversine_km(prev, nxt)
+
+        candidates = sorted(range(1, n + 1), key=screened_cost)[:self.INSERTION_CANDIDATES]
+
+        best = None
+        for p in candidates:
+            to_new = self._distance(self.ports[p - 1]["coordinates"], coords)
+            from_new = self._distance(coords, self.ports[p]["coordinates"]) if p < n else None
+            cost = to_new + (from_new - self.legs[p - 1] if from_new is not None else 0)
+            if best is None or cost < best[0]:
+                best = (cost, p, to_new, from_new)
+
+        _, p, to_new, from_new = best
+        self.ports.insert(p, port)
+        if from_new is None:
+            self.legs.append(to_new)
+        else:
+            self.legs[p - 1:p] = [to_new, from_new]
+
+        self._repair(p)
+
+    def remove(self, index):
+        del self.ports[index]
+        if index == 0:
+            del self.legs[0]
+        elif index >= len(self.legs):
+            del self.legs[-1]
+        else:
+            self.legs[index - 1:index + 1] = [
+                self._distance(self.ports[index - 1]["coordinates"], self.ports[index]["coordinates"])
+            ]
+
+        self._repair(max(index - 1, 0))
+
+    def _repair(self, center):
+        """
+        2-opt moves whose both cut points lie within `REPAIR_WINDOW` of `center`.
+        Reversing ports[i+1..j] swaps legs (i, i+1) & (j, j+1) for (i, j) & (i+1, j+1);
+        the starting port never moves.
+        """
+        for _ in range(self.MAX_REPAIR_PASSES):
+            n = len(self.ports)
+            lo = max(center - self.REPAIR_WINDOW, 0)
+            hi = min(center + self.REPAIR_WINDOW, n - 1)
+            improved = False
+
+            for i in range(lo, hi):
+                for j in range(i + 2, hi + 1):
+                    a, b = self.ports[i]["coordinates"], self.ports[i + 1]["coordinates"]
+                    c = self.ports[j]["coordinates"]
+                    d = self.ports[j + 1]["coordinates"] if j + 1 < n else None
+
+                    screened = haversine_km(a, c) - haversine_km(a, b)
+                    if d is not None:
+                        screened += haversine_km(b, d) - haversine_km(c, d)
+                    if screened >= 0:
+                        continue
+
+                    new_first = self._distance(a, c)
+                    new_second = self._distance(b, d) if d is not None else None
+                    delta = new_first - self.legs[i]
+                    if new_second is not None:
+                        delta += new_second - self.legs[j]
+                    if delta >= -1e-9:
+                        continue
+
+                    self.ports[i + 1:j + 1] = self.ports[i + 1:j + 1][::-1]
+                    inner = self.legs[i + 1:j][::-1]
+                    if new_second is not None:
+                        self.legs[i:j + 1] = [new_first] + inner + [new_second]
+                    else:
+                        self.legs[i:j] = [new_first] + inner
+                    improved = True
+
+            if not improved:
+                return
+
+
+# 🔹 In-memory store of editable tours (least recently used tours are dropped first)
+class TourStore:
+    def __init__(self, max_tours=1000):
+        self.max_tours = max_tours
+        self._lock = threading.Lock()
+        self._tours = OrderedDict()
+
+    def create(self, ports, ship_type, distance):
+        tour = Tour(uuid.uuid4().hex, ports, ship_type, distance)
+        with self._lock:
+            self._tours[tour.id] = tour
+            while len(self._tours) > self.max_tours:
+                self._tours.popitem(last=False)
+        return tour
+
+    def get(self, tour_id):
+        with self._lock:
+            tour = self._tours.get(tour_id)
+            if tour is not None:
+                self._tours.move_to_end(tour_id)
+            return tour
+
+    def delete(self, tour_id):
+        with self._lock:
+            return self._tours.pop(tour_id, None) is not None